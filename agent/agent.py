@@ -1,22 +1,31 @@
+from typing import AsyncGenerator
 from llama_index.core.agent.workflow import FunctionAgent
+from llama_index.core.llms import LLM, ChatMessage, MessageRole
+from agent.deadline import Deadline, run_with_budget
+from agent.prefetch import PrefetchCache
 from agent.rag_tool import RAGTool
 from llama_index.core import Settings
 from agent.web_search_tool import WebSearchTool
+from agent.constants import TURN_TIMEOUT, CANCEL_GRACE_PERIOD
 from config import SYSTEM_PROMPTS, DOCS_DIRECTORY
 
 def build_agent(
     assistant: str = "uk",
     use_rag: bool = False,
     use_web_search: bool = False,
+    deadline: Deadline | None = None,
+    prefetch: PrefetchCache | None = None,
 ) -> FunctionAgent:
+    # Every tool and the agent itself work against the same turn deadline
+    deadline = deadline or Deadline(TURN_TIMEOUT)
     _tools = []
     # Add RAG tool if enabled
     if use_rag:
-        rag_tool = RAGTool(DOCS_DIRECTORY)
-        _tools.append(rag_tool.as_query_engine_tool())
+        rag_tool = RAGTool(DOCS_DIRECTORY, deadline=deadline, prefetch=prefetch)
+        _tools.append(rag_tool.as_function_tool())
     # Add web search tool if enabled
     if use_web_search:
-        web_search_tool = WebSearchTool()
+        web_search_tool = WebSearchTool(deadline=deadline, prefetch=prefetch)
         _tools.append(web_search_tool.as_function_tool())
 
     # Use system prompt from config
@@ -27,7 +36,40 @@ def build_agent(
         llm=Settings.llm,
         system_prompt=_system_prompt,
         verbose=True,
-        timeout=300,
+        # Small margin so the caller's turn deadline always fires before the workflow's own timeout
+        timeout=deadline.remaining() + CANCEL_GRACE_PERIOD,
         streaming=True
         )
     return agent
+
+async def stream_direct_answer(
+    user_input: str,
+    chat_history: list[ChatMessage],
+    deadline: Deadline,
+    assistant: str = "uk",
+    evidence: list[str] | None = None,
+    llm: LLM | None = None,
+) -> AsyncGenerator[str, None]:
+    """Stream an answer straight from the LLM without tools, grounded in any evidence already collected"""
+    _system_prompt = SYSTEM_PROMPTS.get(assistant, "")
+    if evidence:
+        _system_prompt += "\n\nUse the following evidence gathered for this question:\n\n" + "\n\n---\n\n".join(evidence)
+
+    messages = [ChatMessage(role=MessageRole.SYSTEM, content=_system_prompt), *chat_history]
+    # The app's history already ends with this turn's message, so only add it when it's missing
+    last = chat_history[-1] if chat_history else None
+    if last is None or last.role != MessageRole.USER or last.content != user_input:
+        messages.append(ChatMessage(role=MessageRole.USER, content=user_input))
+
+    llm = llm or Settings.llm
+    stream = await run_with_budget(llm.astream_chat(messages), deadline.remaining(), scope="generation")
+    try:
+        while True:
+            try:
+                chunk = await run_with_budget(anext(stream), deadline.remaining(), scope="generation")
+            except StopAsyncIteration:
+                break
+            if chunk.delta:
+                yield chunk.delta
+    finally:
+        await stream.aclose()
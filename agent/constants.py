@@ -0,0 +1,18 @@
+# Tuning values for the agent, kept free of import side effects (unlike config.py, which builds the models)
+
+# Per-turn deadline budgets (seconds)
+TURN_TIMEOUT = 90  # whole agent turn, tools and answer included
+RETRIEVAL_TIMEOUT = 30  # rag tool: vector retrieval plus synthesis
+WEB_SEARCH_TIMEOUT = 20  # web_search tool: Tavily call
+GENERATION_TIMEOUT = 30  # reserved at the end of the turn for writing the answer
+CANCEL_GRACE_PERIOD = 2  # max wait for a cancelled workflow or prefetch to wind down
+
+# Minimum cosine similarity between the embeddings of the user's message and a tool query for the tool to reuse the prefetched result
+PREFETCH_SIMILARITY_THRESHOLD = 0.8
+# Follow-ups with history shorter than this skip the prefetch, since the agent's query will add the missing context
+PREFETCH_MIN_FOLLOW_UP_WORDS = 8
+
+# Query router
+ROUTER_EXAMPLES_PATH = "./data/router_examples.jsonl"  # builds the embedding model's centroids
+ROUTER_EVAL_PATH = "./data/router_eval.jsonl"  # held out, only used by evaluate_router.py
+ROUTER_MIN_MARGIN = 0.05  # cosine margin the fast centroid must win by before the embedding model picks the fast path
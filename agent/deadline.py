@@ -0,0 +1,50 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, TypeVar
+
+from agent.metrics import increment
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """Wall-clock budget for a single agent turn, shared by the agent, its tools and the LLM calls"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, cap: float, reserve: float = 0.0) -> float:
+        """Seconds available for one step: at most `cap`, leaving `reserve` seconds for later steps"""
+        return max(0.0, min(cap, self.remaining() - reserve))
+
+    def child(self, cap: float, reserve: float = 0.0) -> "Deadline":
+        """Deadline for a sub-step that never outlives this one"""
+        child = Deadline(cap)
+        child.expires_at = min(child.expires_at, self.expires_at - reserve)
+        return child
+
+
+async def run_with_budget(awaitable: Awaitable[T], timeout: float, scope: str) -> T:
+    """
+    Await `awaitable` for at most `timeout` seconds.
+    Timeouts and cancellations are counted under `scope` and re-raised to the caller.
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        increment(f"{scope}.timeouts")
+        logger.warning(f"{scope} missed its deadline of {timeout:.1f}s")
+        raise
+    except asyncio.CancelledError:
+        increment(f"{scope}.cancellations")
+        logger.info(f"{scope} was cancelled")
+        raise
@@ -0,0 +1,38 @@
+import threading
+from collections import Counter
+
+# Process-wide counters shared by every Streamlit session (e.g. "rag.timeouts", "turn.cancellations")
+_counters = Counter()
+# Running [count, total] per timing name (e.g. "turn.agent_seconds")
+_timings: dict[str, list[float]] = {}
+_lock = threading.Lock()
+
+
+def increment(name: str, amount: int = 1):
+    """Increment a named counter"""
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name: str, value: float):
+    """Record one measurement for a named timing"""
+    with _lock:
+        timing = _timings.setdefault(name, [0, 0.0])
+        timing[0] += 1
+        timing[1] += value
+
+
+def get_average(name: str) -> float | None:
+    """Mean of a named timing, or None if nothing was recorded"""
+    with _lock:
+        count, total = _timings.get(name, (0, 0.0))
+        return total / count if count else None
+
+
+def get_metrics() -> dict[str, float]:
+    """Return a snapshot of all counters and timing averages, sorted by name"""
+    with _lock:
+        metrics = dict(_counters)
+        for name, (count, total) in _timings.items():
+            metrics[f"{name}.avg"] = round(total / count, 3)
+        return dict(sorted(metrics.items()))
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import Any, Awaitable
+
+from llama_index.core import Settings
+from llama_index.core.embeddings import BaseEmbedding
+
+from agent.constants import CANCEL_GRACE_PERIOD, PREFETCH_SIMILARITY_THRESHOLD, PREFETCH_MIN_FOLLOW_UP_WORDS
+from agent.deadline import Deadline, run_with_budget
+from agent.metrics import increment
+
+logger = logging.getLogger(__name__)
+
+
+def should_prefetch(query: str, has_history: bool) -> bool:
+    """Short follow-ups lean on the conversation, so the agent's tool query won't resemble the bare message"""
+    return not has_history or len(query.split()) >= PREFETCH_MIN_FOLLOW_UP_WORDS
+
+
+class PrefetchCache:
+    """
+    Speculative tool results for the raw user message, started before the agent decides to call a tool.
+    Tools reuse a result when the embedding of the agent's own query is close enough to the user's message.
+    """
+
+    def __init__(self, query: str, embed_model: BaseEmbedding | None = None, threshold: float = PREFETCH_SIMILARITY_THRESHOLD):
+        self.query = query
+        self.threshold = threshold
+        self._embed_model = embed_model or Settings.embed_model
+        self._embeddings: dict[str, asyncio.Task] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._used: set[str] = set()
+
+    def embedding(self, query: str) -> Awaitable[list[float]]:
+        """Query embedding, computed once per query and shared by the prefetch, the similarity check and retrieval"""
+        cached = self._embeddings.get(query)
+        if cached is None or _failed(cached):
+            # A failed embedding is computed again rather than failing every later comparison
+            self._embeddings[query] = asyncio.ensure_future(self._embed_model.aget_query_embedding(query))
+        # Shield so a caller timing out doesn't cancel the embedding for the other callers
+        return asyncio.shield(self._embeddings[query])
+
+    async def similarity(self, query: str) -> float:
+        """Cosine similarity between the embeddings of the user's message and `query`"""
+        if query == self.query:
+            return 1.0
+        return self._embed_model.similarity(await self.embedding(self.query), await self.embedding(query))
+
+    def start(self, name: str, awaitable: Awaitable[Any]):
+        """Start fetching the result for tool `name` in the background"""
+        self._tasks[name] = asyncio.ensure_future(awaitable)
+        # Embed the user's message now so the similarity check doesn't wait for it later
+        self.embedding(self.query)
+        increment(f"{name}.prefetch_started")
+
+    async def take(self, name: str, query: str, deadline: Deadline) -> Any | None:
+        """
+        Return the prefetched result for tool `name`, or None if there is none or `query` differs too much.
+        The similarity check is bounded by `deadline`; the prefetch itself already runs within a budget that ends no later.
+        A prefetch that missed its deadline re-raises asyncio.TimeoutError like the live call would.
+        """
+        task = self._tasks.get(name)
+        if task is None:
+            return None
+        if _failed(task) and (task.cancelled() or not isinstance(task.exception(), asyncio.TimeoutError)):
+            # Nothing to reuse, so don't spend an embedding call on the comparison
+            logger.info(f"Prefetched {name} call failed, running it again")
+            return None
+
+        try:
+            similarity = await run_with_budget(self.similarity(query), deadline.remaining(), scope=name)
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            logger.warning(f"Could not compare the {name} query with the prefetched one: {e}")
+            return None
+        if similarity < self.threshold:
+            increment(f"{name}.prefetch_misses")
+            logger.info(f"Prefetched {name} result not reused, similarity {similarity:.2f} for query: {query[:50]}...")
+            return None
+
+        try:
+            # Shield so a cancelled tool call leaves the prefetch for close() to cancel and count
+            result = await asyncio.shield(task)
+        except asyncio.TimeoutError:
+            # Already counted by the prefetch's own budget
+            self._used.add(name)
+            raise
+        except Exception as e:
+            logger.warning(f"Prefetched {name} call failed, running it again: {e}")
+            return None
+
+        self._used.add(name)
+        increment(f"{name}.prefetch_hits")
+        logger.info(f"Reused prefetched {name} result, similarity {similarity:.2f}")
+        return result
+
+    async def close(self):
+        """Cancel prefetches that are still running, wait for them to wind down and count the ones that were never used"""
+        for name in self._tasks:
+            if name not in self._used:
+                increment(f"{name}.prefetch_wasted")
+        tasks = [*self._tasks.values(), *self._embeddings.values()]
+        self._tasks.clear()
+        self._embeddings.clear()
+
+        pending = {task for task in tasks if not task.done()}
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=CANCEL_GRACE_PERIOD)
+        for task in tasks:
+            if task.done() and not task.cancelled():
+                # Retrieve the exception so asyncio does not log it as unhandled
+                task.exception()
+
+
+def _failed(task: asyncio.Future) -> bool:
+    return task.done() and (task.cancelled() or task.exception() is not None)
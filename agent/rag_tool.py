@@ -1,19 +1,60 @@
-from llama_index.core.tools import QueryEngineTool
+import asyncio
+from llama_index.core import get_response_synthesizer
+from llama_index.core.base.response.schema import Response
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.tools import FunctionTool
 from llama_index.core.vector_stores.types import VectorStoreQueryMode
 
+from agent.deadline import Deadline, run_with_budget
+from agent.prefetch import PrefetchCache
 from agent.utils import get_or_create_vector_index
+from agent.constants import TURN_TIMEOUT, RETRIEVAL_TIMEOUT, GENERATION_TIMEOUT
 from config import VECTOR_INDEX_DIR
 
 class RAGTool:
-    def __init__(self, docs_dir: str):
+    def __init__(self, docs_dir: str, deadline: Deadline | None = None, prefetch: PrefetchCache | None = None):
         self._index = get_or_create_vector_index(docs_dir, VECTOR_INDEX_DIR)
-        self._query_engine = self._index.as_query_engine(vector_store_query_mode=VectorStoreQueryMode.DEFAULT, similarity_top_k=10, response_mode="compact_accumulate")
+        self._retriever = self._index.as_retriever(vector_store_query_mode=VectorStoreQueryMode.DEFAULT, similarity_top_k=10)
+        self._synthesizer = get_response_synthesizer(response_mode="compact_accumulate")
+        self._deadline = deadline or Deadline(TURN_TIMEOUT)
+        self._prefetch = prefetch
+        # Retrieve for the user's own message while the agent is still planning its tool calls
+        if prefetch:
+            prefetch.start("rag", self._retrieve(prefetch.query, self._deadline.child(RETRIEVAL_TIMEOUT, reserve=GENERATION_TIMEOUT)))
 
-    def as_query_engine_tool(self) -> QueryEngineTool:
-        # Return a QueryEngineTool for direct agent use
-        return QueryEngineTool.from_defaults(
-            query_engine=self._query_engine,
+    async def _retrieve(self, query: str, deadline: Deadline) -> list[NodeWithScore]:
+        return await run_with_budget(self._embed_and_retrieve(query), deadline.remaining(), scope="rag")
+
+    async def _embed_and_retrieve(self, query: str) -> list[NodeWithScore]:
+        # Reuse the query embedding the prefetch similarity check computes anyway
+        embedding = await self._prefetch.embedding(query) if self._prefetch else None
+        return await self._retriever.aretrieve(QueryBundle(query_str=query, embedding=embedding))
+
+    async def rag(self, query: str) -> Response:
+        # Retrieval and synthesis share one budget, leaving time at the end of the turn for the answer
+        tool_deadline = self._deadline.child(RETRIEVAL_TIMEOUT, reserve=GENERATION_TIMEOUT)
+        try:
+            nodes = await self._prefetch.take("rag", query, tool_deadline) if self._prefetch else None
+            if nodes is None:
+                nodes = await self._retrieve(query, tool_deadline)
+        except asyncio.TimeoutError:
+            return Response(response="The research document search did not finish in time. Answer using the other evidence available.", source_nodes=[])
+
+        try:
+            return await run_with_budget(self._synthesizer.asynthesize(query, nodes), tool_deadline.remaining(), scope="rag_synthesis")
+        except asyncio.TimeoutError:
+            # Synthesis ran out of time, so hand the retrieved passages to the agent as they are
+            passages = "\n\n".join(node.node.get_content() for node in nodes)
+            return Response(response=f"Relevant passages from research documents:\n\n{passages}", source_nodes=nodes)
+
+    def as_function_tool(self) -> FunctionTool:
+
+        async def tool_fn(query: str) -> Response:
+            return await self.rag(query)
+
+        # Return a FunctionTool for direct agent use
+        return FunctionTool.from_defaults(
+            async_fn=tool_fn,
             name="rag",
             description="Useful for answering questions from the indexed research documents and publications. Use a detailed plain text question as input to the tool with the word 'summarize' in it. ",
         )
-
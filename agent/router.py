@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import re
+import time
+
+from pydantic import BaseModel
+from llama_index.core.embeddings import BaseEmbedding
+
+from agent.constants import ROUTER_EXAMPLES_PATH, ROUTER_MIN_MARGIN
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"  # direct answer from the fast model, no tools, small output budget
+AGENT = "agent"  # full FunctionAgent tool loop
+
+# A message made only of these words is a greeting or acknowledgement and needs no evidence
+_ACKNOWLEDGEMENT_WORDS = {
+    "hi", "hii", "hello", "hey", "hiya", "namaste", "good", "morning", "afternoon", "evening", "night", "there",
+    "thanks", "thank", "you", "so", "much", "very", "a", "lot", "thx", "cheers", "ok", "okay", "alright", "great",
+    "cool", "nice", "perfect", "brilliant", "lovely", "wonderful", "awesome", "got", "it", "understood", "sure",
+    "yes", "yeah", "yep", "no", "nope", "please", "bye", "goodbye", "see", "later", "that", "was", "helpful",
+    "sounds", "fine", "again", "all", "everyone",
+}
+# After an answer these usually accept or decline something the assistant offered or asked, which needs the agent
+_REPLY_WORDS = {"yes", "yeah", "yep", "sure", "please", "no", "nope"}
+_REWRITE = re.compile(
+    r"\b(shorter|simpler|simply|simplify|rephrase|reword|summari[sz]e|tl;?dr|say (that|it) again|"
+    r"what do you mean|plain (words|english|language)|hindi|translate)\b"
+)
+# Words a request to reword the previous answer may use; anything else is new content that needs the agent
+_REWRITE_WORDS = _ACKNOWLEDGEMENT_WORDS | {
+    "can", "could", "would", "make", "this", "short", "shorter", "simple", "simpler", "simply", "simplify",
+    "rephrase", "reword", "summarize", "summarise", "tl", "dr", "say", "more", "what", "do", "does", "mean",
+    "in", "into", "words", "english", "language", "plain", "hindi", "translate", "explain", "the", "answer",
+    "last", "bit", "little", "me", "to", "for", "i", "don't", "dont", "understand", "by", "easier", "way", "your",
+}
+# Questions about the assistant itself rather than the child's care
+_ABOUT_ASSISTANT = re.compile(r"\b(who are you|what are you|what can you do|your name|(use|using) this (app|assistant|chat))\b")
+_ABOUT_ASSISTANT_WORDS = _ACKNOWLEDGEMENT_WORDS | {
+    "who", "what", "are", "can", "do", "your", "name", "how", "i", "use", "using", "this", "app", "assistant",
+    "chat", "does", "work", "is",
+}
+# Word stems that mark a question about the child or their care, which needs the tools' evidence
+_EVIDENCE_STEMS = (
+    "autis", "asd", "adhd", "diagnos", "therap", "sensor", "meltdown", "shutdown", "behavio", "stim", "routine",
+    "school", "teacher", "ehcp", "sleep", "speech", "languag", "communicat", "eat", "food", "feed", "diet",
+    "toilet", "nhs", "gp", "doctor", "medic", "research", "evidence", "stud", "anxi", "social", "play",
+    "child", "son", "daughter", "kid", "toddler", "teen", "support", "service", "benefit", "source",
+)
+_MAX_TRIVIAL_WORDS = 8
+
+
+class RouteDecision(BaseModel):
+    route: str  # FAST or AGENT
+    reason: str
+    latency_ms: float = 0.0
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def heuristic_route(message: str, has_history: bool) -> tuple[str, str] | None:
+    """
+    Return (route, reason) when the rules are confident, or None to defer to the embedding model.
+    The fast path is only chosen when every word of the message belongs to a closed vocabulary.
+    """
+    text = message.strip().lower()
+    words = set(_words(text))
+    if not words:
+        return FAST, "empty"
+
+    if any(word.startswith(_EVIDENCE_STEMS) for word in words):
+        return AGENT, "care topic"
+
+    if "?" not in text and len(_words(text)) <= _MAX_TRIVIAL_WORDS and words <= _ACKNOWLEDGEMENT_WORDS:
+        if has_history and words & _REPLY_WORDS:
+            return AGENT, "reply to the assistant's offer or question"
+        return FAST, "greeting or acknowledgement"
+
+    # A rewording request with no new content words can only point back at the previous answer
+    if has_history and _REWRITE.search(text) and words <= _REWRITE_WORDS:
+        return FAST, "rewrite of previous answer"
+
+    if _ABOUT_ASSISTANT.search(text) and words <= _ABOUT_ASSISTANT_WORDS:
+        return FAST, "about the assistant"
+
+    return None
+
+
+class EmbeddingRouter:
+    """Nearest-centroid classifier over embeddings of labelled example messages"""
+
+    def __init__(self, embed_model: BaseEmbedding, centroids: dict[str, list[float]]):
+        self._embed_model = embed_model
+        self._centroids = centroids
+
+    @classmethod
+    def from_examples(cls, embed_model: BaseEmbedding, examples: list[dict]) -> "EmbeddingRouter":
+        embeddings = embed_model.get_text_embedding_batch([example["message"] for example in examples])
+        return cls(embed_model, compute_centroids(examples, embeddings))
+
+    def margin(self, message: str) -> float:
+        """Cosine similarity to the fast centroid minus similarity to the agent centroid"""
+        if len(self._centroids) < 2:
+            return -1.0
+        embedding = self._embed_model.get_query_embedding(message)
+        fast_similarity = self._embed_model.similarity(embedding, self._centroids[FAST])
+        agent_similarity = self._embed_model.similarity(embedding, self._centroids[AGENT])
+        return fast_similarity - agent_similarity
+
+
+class QueryRouter:
+    """
+    Chooses between the fast path and the full agent for each turn.
+    Heuristics decide the clear cases; the optional embedding model decides the rest, defaulting to the agent.
+    """
+
+    def __init__(self, embedding_router: EmbeddingRouter | None = None, min_margin: float = ROUTER_MIN_MARGIN):
+        self._embedding_router = embedding_router
+        self._min_margin = min_margin
+
+    async def aroute(self, message: str, has_history: bool = False) -> RouteDecision:
+        started = time.perf_counter()
+        decision = heuristic_route(message, has_history)
+        if decision is None and self._embedding_router:
+            # The local model runs synchronously, so keep it off the event loop
+            margin = await asyncio.to_thread(self._embedding_router.margin, message)
+            route = FAST if margin >= self._min_margin else AGENT
+            decision = (route, f"embedding margin {margin:.3f}")
+        elif decision is None:
+            decision = (AGENT, "default")
+
+        route, reason = decision
+        return RouteDecision(route=route, reason=reason, latency_ms=(time.perf_counter() - started) * 1000)
+
+
+def load_examples(path: str) -> list[dict]:
+    """Labelled router examples: one JSON object per line with 'message', 'has_history' and 'route'"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_embed_model(model_name: str) -> BaseEmbedding | None:
+    """Local sentence-embedding model for the router, or None if the HuggingFace integration isn't installed"""
+    try:
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+    except ImportError:
+        logger.warning("ROUTER_EMBED_MODEL is set but llama-index-embeddings-huggingface is not installed; using heuristics only")
+        return None
+    return HuggingFaceEmbedding(model_name=model_name)
+
+
+def build_router(embed_model_name: str | None = None) -> QueryRouter:
+    """
+    Router with the embedding model loaded and its centroids built from ROUTER_EXAMPLES_PATH if `embed_model_name` is given.
+    Slow with an embedding model, so build it once per process.
+    """
+    embedding_router = None
+    if embed_model_name:
+        embed_model = load_embed_model(embed_model_name)
+        if embed_model:
+            embedding_router = EmbeddingRouter.from_examples(embed_model, load_examples(ROUTER_EXAMPLES_PATH))
+            logger.info(f"Query router using embedding model {embed_model_name}")
+    return QueryRouter(embedding_router)
+
+
+def compute_centroids(examples: list[dict], embeddings: list[list[float]]) -> dict[str, list[float]]:
+    """Mean embedding per route"""
+    centroids = {}
+    for route in (FAST, AGENT):
+        vectors = [embedding for example, embedding in zip(examples, embeddings) if example["route"] == route]
+        if vectors:
+            centroids[route] = _mean(vectors)
+    return centroids
+
+
+def _mean(vectors: list[list[float]]) -> list[float]:
+    return [sum(values) / len(vectors) for values in zip(*vectors)]
+
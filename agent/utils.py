@@ -87,6 +87,15 @@ def get_llm_model(api_key: str):
     context_window=1048576
 )
 
+def get_fast_llm_model(api_key: str, max_tokens: int = 1024):
+    return GoogleGenAI(
+    model="gemini-2.5-flash-lite",
+    api_key=api_key,
+    temperature=0.7,
+    max_tokens=max_tokens,
+    context_window=1048576
+)
+
 def get_or_create_vector_index(docs_dir: str, index_dir: str) -> VectorStoreIndex:
     # Check if index storage exists
     if os.path.exists(index_dir) and os.listdir(index_dir):
@@ -1,15 +1,67 @@
+import asyncio
 from tavily import AsyncTavilyClient
 from llama_index.core.tools import FunctionTool
 from llama_index.core.schema import TextNode, NodeWithScore
+from agent.deadline import Deadline, run_with_budget
+from agent.prefetch import PrefetchCache
+from agent.constants import TURN_TIMEOUT, WEB_SEARCH_TIMEOUT, GENERATION_TIMEOUT
 from config import TAVILY_API_KEY
 
+# Response object that matches the RAG tool output format
+class WebSearchResponse:
+    def __init__(self, query, results, images, source_nodes, timed_out=False):
+        self.query = query
+        self.results = results
+        self.images = images
+        self.source_nodes = source_nodes
+        self.timed_out = timed_out
+        
+    def __str__(self):
+        # Return a formatted summary for the LLM
+        if self.timed_out:
+            return f"Web search for '{self.query}' did not finish in time. Answer using the other evidence available."
+
+        summary = f"Web search results for '{self.query}':\n\n"
+        for i, result in enumerate(self.results[:5]):  # Show top 5 results
+            summary += f"{i+1}. {result.get('title', 'No Title')}\n"
+            summary += f"   URL: {result.get('url', '')}\n"
+            summary += f"   Content: {result.get('content', '')}\n\n"
+        
+        if self.images:
+            summary += f"\nFound {len(self.images)} related images from NHS sources:\n"
+            for i, img_data in enumerate(self.images[:5]):  # Show top 5 images
+                if isinstance(img_data, dict):
+                    # Image data is an object with url and description
+                    img_url = img_data.get('url', '')
+                    img_desc = img_data.get('description', '')
+                    summary += f"- Image {i+1}: {img_url}\n"
+                    if img_desc:
+                        summary += f"  Description: {img_desc}\n"
+                else:
+                    # Fallback for string URLs (backward compatibility)
+                    summary += f"- Image {i+1}: {img_data}\n"
+            summary += "\n"
+        
+        summary += f"Total results: {len(self.results)} web pages, {len(self.images)} images"
+        return summary
+
+
 class WebSearchTool:
 
-    def __init__(self):
+    def __init__(self, deadline: Deadline | None = None, prefetch: PrefetchCache | None = None):
         self.client = AsyncTavilyClient(api_key=TAVILY_API_KEY)
+        self._deadline = deadline or Deadline(TURN_TIMEOUT)
+        self._prefetch = prefetch
+        # Search for the user's own message while the agent is still planning its tool calls
+        if prefetch:
+            prefetch.start("web_search", self._search(prefetch.query, self._tool_deadline()))
 
-    async def web_search(self, query: str) -> str:
-        result = await self.client.search( 
+    def _tool_deadline(self) -> Deadline:
+        # Leave time at the end of the turn for writing the answer
+        return self._deadline.child(WEB_SEARCH_TIMEOUT, reserve=GENERATION_TIMEOUT)
+
+    async def _search(self, query: str, deadline: Deadline) -> dict:
+        search = self.client.search( 
             query=query,
             search_depth="advanced",
             include_images=True,
@@ -17,6 +69,16 @@ class WebSearchTool:
             include_domains=["nhs.uk"],
             time_range="year"
         )
+        return await run_with_budget(search, deadline.remaining(), scope="web_search")
+
+    async def web_search(self, query: str) -> str:
+        try:
+            tool_deadline = self._tool_deadline()
+            result = await self._prefetch.take("web_search", query, tool_deadline) if self._prefetch else None
+            if result is None:
+                result = await self._search(query, tool_deadline)
+        except asyncio.TimeoutError:
+            return WebSearchResponse(query=query, results=[], images=[], source_nodes=[], timed_out=True)
 
         # Create source nodes compatible with RAG tool output
         source_nodes = []
@@ -39,40 +101,6 @@ class WebSearchTool:
             )
             source_nodes.append(node_with_score)
 
-        # Create response object that matches expected format
-        class WebSearchResponse:
-            def __init__(self, query, results, images, source_nodes):
-                self.query = query
-                self.results = results
-                self.images = images
-                self.source_nodes = source_nodes
-                
-            def __str__(self):
-                # Return a formatted summary for the LLM
-                summary = f"Web search results for '{self.query}':\n\n"
-                for i, result in enumerate(self.results[:5]):  # Show top 5 results
-                    summary += f"{i+1}. {result.get('title', 'No Title')}\n"
-                    summary += f"   URL: {result.get('url', '')}\n"
-                    summary += f"   Content: {result.get('content', '')}\n\n"
-                
-                if self.images:
-                    summary += f"\nFound {len(self.images)} related images from NHS sources:\n"
-                    for i, img_data in enumerate(self.images[:5]):  # Show top 5 images
-                        if isinstance(img_data, dict):
-                            # Image data is an object with url and description
-                            img_url = img_data.get('url', '')
-                            img_desc = img_data.get('description', '')
-                            summary += f"- Image {i+1}: {img_url}\n"
-                            if img_desc:
-                                summary += f"  Description: {img_desc}\n"
-                        else:
-                            # Fallback for string URLs (backward compatibility)
-                            summary += f"- Image {i+1}: {img_data}\n"
-                    summary += "\n"
-                
-                summary += f"Total results: {len(self.results)} web pages, {len(self.images)} images"
-                return summary
-        
         response = WebSearchResponse(
             query=query,
             results=result.get("results", []),
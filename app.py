@@ -1,12 +1,19 @@
 import streamlit as st
 import asyncio
 import logging
+import time
+from contextlib import aclosing
 from typing import AsyncGenerator
-from agent.agent import build_agent
+from agent.agent import build_agent, stream_direct_answer
+from agent.deadline import Deadline, run_with_budget
+from agent.metrics import increment, observe, get_average, get_metrics
+from agent.prefetch import PrefetchCache, should_prefetch
+from agent.router import FAST, QueryRouter, build_router
 from models import Message, messages_to_llamaindex_chat_history
-from llama_index.core.workflow import Context
-from llama_index.core.agent.workflow import AgentStream, ToolCallResult
-from config import SYSTEM_PROMPTS
+from llama_index.core.workflow import Context, WorkflowTimeoutError
+from llama_index.core.agent.workflow import AgentStream, ToolCall, ToolCallResult
+from agent.constants import TURN_TIMEOUT, GENERATION_TIMEOUT, CANCEL_GRACE_PERIOD
+from config import SYSTEM_PROMPTS, FAST_LLM, ROUTER_EMBED_MODEL
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -136,6 +143,12 @@ def render_citations(sources, message_index=0):
                     st.rerun()
 
 
+@st.cache_resource
+def get_router() -> QueryRouter:
+    """Query router, built once per server process so no turn pays for loading its embedding model"""
+    return build_router(ROUTER_EMBED_MODEL)
+
+
 # Initialize session state FIRST
 initialize_session_state()
 
@@ -145,19 +158,17 @@ if not validate_session_state():
     st.stop()
 
 async def get_agent_response(user_input: str, assistant: str, use_rag: bool, use_web_search: bool, messages: list) -> AsyncGenerator[str, None]:
-    """Get streaming response from the FunctionAgent"""
+    """Get streaming response from the fast path or the FunctionAgent, as chosen by the query router"""
     handler = None
+    started = time.perf_counter()
+    prefetch = None
+    evidence = []
+    answer_started = False
+    timed_out = False
     
     try:
         logger.info(f"Processing user input: {user_input[:50]}...")
         
-        # Build agent with current settings
-        agent = build_agent(
-            assistant=assistant,
-            use_rag=use_rag,
-            use_web_search=use_web_search,
-        )
-        
         # Convert chat history to the format expected by the agent
         chat_messages = [
             Message(sender=msg["role"], content=msg["content"])
@@ -165,6 +176,42 @@ async def get_agent_response(user_input: str, assistant: str, use_rag: bool, use
             if msg["role"] in ("user", "assistant")
         ]
         chat_history = messages_to_llamaindex_chat_history(chat_messages)
+        has_history = len(chat_messages) > 1
+        
+        # Greetings, thanks and rewording requests skip the tool loop and get a short direct answer
+        decision = await query_router.aroute(user_input, has_history=has_history)
+        increment(f"router.{decision.route}")
+        logger.info(f"Router chose {decision.route} path ({decision.reason}) in {decision.latency_ms:.1f}ms")
+        
+        # One deadline for the rest of the turn, shared with every tool and LLM call
+        deadline = Deadline(TURN_TIMEOUT)
+        # Agent turn times are kept per tool setting, since tools dominate how long a turn takes
+        tool_mode = "+".join(name for name, enabled in (("rag", use_rag), ("web_search", use_web_search)) if enabled) or "no_tools"
+        if decision.route == FAST:
+            async with aclosing(stream_direct_answer(user_input, chat_history, deadline, assistant=assistant, llm=FAST_LLM)) as answer:
+                async for delta in answer:
+                    yield delta
+            elapsed = time.perf_counter() - started
+            observe("turn.fast_seconds", elapsed)
+            # Estimate only: compares with past agent turns for other questions under the same tool settings
+            agent_average = get_average(f"turn.agent_seconds.{tool_mode}")
+            if agent_average is not None:
+                observe("router.latency_saved_estimate_seconds", agent_average - elapsed)
+                logger.info(f"Fast path answered in {elapsed:.2f}s, an estimated {agent_average - elapsed:.2f}s faster than an average {tool_mode} agent turn")
+            return
+        
+        # Enabled tools start retrieving for the raw user message in parallel with the agent's first planning call
+        if should_prefetch(user_input, has_history):
+            prefetch = PrefetchCache(user_input)
+        
+        # Build agent with current settings
+        agent = build_agent(
+            assistant=assistant,
+            use_rag=use_rag,
+            use_web_search=use_web_search,
+            deadline=deadline,
+            prefetch=prefetch,
+        )
         
         # Create agent context and run
         agent_ctx = Context(agent)
@@ -172,15 +219,33 @@ async def get_agent_response(user_input: str, assistant: str, use_rag: bool, use
         
         # Stream the response with robust error handling
         try:
-            async for event in handler.stream_events():
+            events = handler.stream_events()
+            while True:
+                # Until the answer starts, keep the generation budget in reserve for the fallback answer
+                if answer_started:
+                    timeout = deadline.remaining()
+                else:
+                    timeout = deadline.budget(TURN_TIMEOUT, reserve=GENERATION_TIMEOUT)
+                try:
+                    event = await run_with_budget(anext(events), timeout, scope="turn")
+                except StopAsyncIteration:
+                    break
+                
                 if isinstance(event, AgentStream):
                     if event.delta:  # Only yield non-empty deltas
+                        # Text from a step that calls tools is planning, not the answer
+                        if not event.tool_calls:
+                            answer_started = True
                         yield event.delta
                 elif isinstance(event, ToolCallResult):
                     tool_name = event.tool_name
                     tool_input = event.tool_kwargs
                     logger.info(f"Tool executed: {tool_name} with input args: {tool_input}")
                     
+                    # Keep the tool output so a fallback answer can be built from it if the turn runs out of time
+                    if hasattr(event, 'tool_output') and event.tool_output.content:
+                        evidence.append(event.tool_output.content)
+                    
                     # Extract source nodes from tool output and store directly in session state
                     if hasattr(event, 'tool_output') and hasattr(event.tool_output, 'raw_output'):
                         raw_output = event.tool_output.raw_output
@@ -190,19 +255,61 @@ async def get_agent_response(user_input: str, assistant: str, use_rag: bool, use
                             current_sources.extend(raw_output.source_nodes)
                             st.session_state._temp_sources = current_sources
                             logger.info(f"Collected {len(raw_output.source_nodes)} source nodes from {tool_name}")
+                elif isinstance(event, ToolCall):
+                    # Any text streamed so far belonged to a planning step, so keep the generation reserve
+                    answer_started = False
+        except (asyncio.TimeoutError, WorkflowTimeoutError):
+            timed_out = True
         finally:
             # Clean up the workflow properly after streaming is complete
             if handler:
                 await handler.cancel_run()
                 logger.info("The stream has been stopped!")
-                # Give the workflow a moment to clean up its internal tasks
-                await asyncio.sleep(0.2)
+                # Wait for the workflow to wind down its internal tasks, without holding the session on it
+                await asyncio.wait({handler}, timeout=CANCEL_GRACE_PERIOD)
+        
+        if timed_out and not answer_started:
+            # Build the answer from whatever evidence already arrived, within the reserved generation budget
+            logger.info(f"Turn deadline reached, answering from {len(evidence)} collected tool results")
+            async with aclosing(stream_direct_answer(user_input, chat_history, deadline, assistant=assistant, evidence=evidence)) as answer:
+                async for delta in answer:
+                    yield delta
+        elif timed_out:
+            yield "\n\n*This answer was cut short because it took too long. Please try again.*"
         
+        observe(f"turn.agent_seconds.{tool_mode}", time.perf_counter() - started)
         logger.info("Response generation completed")
         
+    except GeneratorExit:
+        # The client went away mid-stream; the finally blocks above have already stopped the agent and its tools
+        increment("turn.cancellations")
+        logger.info("Client disconnected, agent run cancelled")
+        raise
     except Exception as e:
         logger.error(f"Agent error: {e}", exc_info=True)
         yield "I apologize, but I encountered an error while processing your request. Please try again."
+    finally:
+        # Drop prefetches the agent never asked for, including any started before a failure in build_agent
+        if prefetch:
+            await prefetch.close()
+
+def stream_sync(async_gen: AsyncGenerator[str, None]):
+    """
+    Drive an async generator on this script run's event loop for st.write_stream.
+    Streamlit's own wrapper closes the loop without closing the generator when a run is stopped,
+    so this one always closes it, which cancels the agent run, tool calls and prefetches.
+    """
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(anext(async_gen))
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(async_gen.aclose())
+
+# Load the router up front, outside any turn's deadline
+query_router = get_router()
 
 # Page title and description
 st.title("🤝 Autism Care Assistant")
@@ -261,6 +368,14 @@ with st.sidebar:
             del st.session_state[key]
         
         st.rerun()
+    
+    # Timeout, cancellation, prefetch and router stats for this server process
+    with st.expander("📊 Diagnostics"):
+        metrics = get_metrics()
+        if metrics:
+            st.json(metrics)
+        else:
+            st.caption("Nothing recorded yet.")
 
 # Display chat messages using native chat components
 for i, message in enumerate(st.session_state.messages):
@@ -308,11 +423,19 @@ if user_input := st.chat_input("Ask me anything about autism support..."):
                 except Exception as e:
                     logger.error(f"Streaming error: {e}")
                     yield "I apologize, but I encountered an error while processing your request. Please try again."
+                finally:
+                    # Release the agent run and its tool connections as soon as streaming stops
+                    await async_gen.aclose()
             
-            # Show spinner while waiting for first response
-            with st.spinner("🤔 Thinking..."):
-                # Stream the response directly
-                full_response = st.write_stream(streaming_response())
+            response_stream = stream_sync(streaming_response())
+            try:
+                # Show spinner while waiting for first response
+                with st.spinner("🤔 Thinking..."):
+                    # Stream the response directly
+                    full_response = st.write_stream(response_stream)
+            finally:
+                # Runs even when Streamlit stops or reruns the script because the client went away
+                response_stream.close()
             
             # Add response to session state
             if full_response and full_response.strip():
@@ -2,7 +2,7 @@ import os
 from dotenv import load_dotenv
 from datetime import datetime
 
-from agent.utils import get_embed_model, get_llm_model
+from agent.utils import get_embed_model, get_llm_model, get_fast_llm_model
 load_dotenv()
 from llama_index.core import Settings
 
@@ -53,7 +53,15 @@ VECTOR_INDEX_DIR = "./data/vector_index"
 CHUNK_SIZE = 2048
 CHUNK_OVERLAP = 50
 
+# Query router: trivial turns skip the agent and get a short direct answer from a faster model
+FAST_MAX_TOKENS = 1024
+# Optional local sentence-embedding model for turns the heuristics can't decide, e.g. "BAAI/bge-small-en-v1.5"
+ROUTER_EMBED_MODEL = os.getenv("ROUTER_EMBED_MODEL")
+
 Settings.llm = get_llm_model(GOOGLE_API_KEY)
 Settings.embed_model = get_embed_model(GOOGLE_API_KEY)
 Settings.chunk_size = CHUNK_SIZE
 Settings.chunk_overlap = CHUNK_OVERLAP
+
+# Model for turns the router sends down the fast path
+FAST_LLM = get_fast_llm_model(GOOGLE_API_KEY, max_tokens=FAST_MAX_TOKENS)
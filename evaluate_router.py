@@ -0,0 +1,80 @@
+"""
+Offline evaluation of the query router against the held-out examples in data/router_eval.jsonl.
+
+    python evaluate_router.py                                       # heuristics only
+    python evaluate_router.py --embed-model BAAI/bge-small-en-v1.5  # heuristics plus the embedding model
+
+The embedding model's centroids are built from data/router_examples.jsonl, as in the app, so the
+evaluation examples are never used for training. Results are printed for a range of margins to help
+tune ROUTER_MIN_MARGIN.
+"""
+import argparse
+
+from agent.router import AGENT, FAST, EmbeddingRouter, heuristic_route, load_embed_model, load_examples
+from agent.constants import ROUTER_EXAMPLES_PATH, ROUTER_EVAL_PATH, ROUTER_MIN_MARGIN
+
+MARGINS = [-0.05, 0.0, 0.02, 0.05, 0.1, 0.15]
+
+
+def score(examples: list[dict], predictions: list[str]) -> dict:
+    fast_predicted = [example for example, route in zip(examples, predictions) if route == FAST]
+    fast_expected = [example for example in examples if example["route"] == FAST]
+    correct_fast = [example for example in fast_predicted if example["route"] == FAST]
+    return {
+        "accuracy": sum(example["route"] == route for example, route in zip(examples, predictions)) / len(examples),
+        # Precision matters most: a wrongly fast-routed question loses its evidence
+        "fast_precision": len(correct_fast) / len(fast_predicted) if fast_predicted else 1.0,
+        "fast_recall": len(correct_fast) / len(fast_expected) if fast_expected else 1.0,
+    }
+
+
+def print_mistakes(examples: list[dict], predictions: list[str], reasons: list[str]):
+    for example, route, reason in zip(examples, predictions, reasons):
+        if route != example["route"]:
+            print(f"  expected {example['route']:5} got {route:5} ({reason}): {example['message']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", default=ROUTER_EXAMPLES_PATH, help="labelled examples for the embedding centroids")
+    parser.add_argument("--eval", default=ROUTER_EVAL_PATH, help="held-out labelled examples to score")
+    parser.add_argument("--embed-model", help="local sentence-embedding model for turns the heuristics can't decide")
+    args = parser.parse_args()
+
+    examples = load_examples(args.eval)
+    heuristics = [heuristic_route(example["message"], example["has_history"]) for example in examples]
+
+    # Heuristics alone, with undecided turns going to the agent as they do in the app
+    predictions = [decision[0] if decision else AGENT for decision in heuristics]
+    reasons = [decision[1] if decision else "default" for decision in heuristics]
+    undecided = sum(decision is None for decision in heuristics)
+    print(f"{len(examples)} examples, {undecided} left undecided by the heuristics")
+    print(f"heuristics only: {score(examples, predictions)}")
+    print_mistakes(examples, predictions, reasons)
+
+    if not args.embed_model:
+        return
+    embed_model = load_embed_model(args.embed_model)
+    if embed_model is None:
+        return
+
+    embedding_router = EmbeddingRouter.from_examples(embed_model, load_examples(args.examples))
+    margins = [
+        None if decision else embedding_router.margin(example["message"])
+        for example, decision in zip(examples, heuristics)
+    ]
+
+    for min_margin in MARGINS:
+        predictions = [
+            decision[0] if decision else (FAST if margin >= min_margin else AGENT)
+            for decision, margin in zip(heuristics, margins)
+        ]
+        marker = "  <- ROUTER_MIN_MARGIN" if min_margin == ROUTER_MIN_MARGIN else ""
+        print(f"min margin {min_margin:+.2f}: {score(examples, predictions)}{marker}")
+        if min_margin == ROUTER_MIN_MARGIN:
+            reasons = [decision[1] if decision else f"embedding margin {margin:.3f}" for decision, margin in zip(heuristics, margins)]
+            print_mistakes(examples, predictions, reasons)
+
+
+if __name__ == "__main__":
+    main()
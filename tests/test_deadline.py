@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from agent.deadline import Deadline, run_with_budget
+from agent.metrics import get_metrics
+
+
+def test_budget_is_capped_by_the_step_limit():
+    deadline = Deadline(60)
+    assert deadline.budget(10) == 10
+
+
+def test_budget_leaves_the_reserve_for_later_steps():
+    deadline = Deadline(60)
+    assert 49 < deadline.budget(100, reserve=10) <= 50
+
+
+def test_budget_is_never_negative():
+    deadline = Deadline(5)
+    assert deadline.budget(10, reserve=30) == 0.0
+    assert Deadline(-1).remaining() == 0.0
+    assert Deadline(-1).expired()
+
+
+def test_child_never_outlives_its_parent():
+    parent = Deadline(20)
+    assert parent.child(30).expires_at <= parent.expires_at
+    assert 4 < parent.child(30, reserve=15).remaining() <= 5
+    assert parent.child(30, reserve=25).expired()
+
+
+def test_run_with_budget_counts_a_timeout_once():
+    before = get_metrics().get("test_timeout.timeouts", 0)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run_with_budget(asyncio.sleep(1), 0.01, scope="test_timeout"))
+    assert get_metrics()["test_timeout.timeouts"] == before + 1
+
+
+def test_run_with_budget_returns_the_result_in_time():
+    async def answer():
+        return 42
+
+    assert asyncio.run(run_with_budget(answer(), 1, scope="test_result")) == 42
+    assert "test_result.timeouts" not in get_metrics()
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from agent.deadline import Deadline, run_with_budget
+from agent.metrics import get_metrics
+from agent.prefetch import PrefetchCache
+
+
+class StubEmbedModel:
+    """Embeds a query as a fixed vector, failing the first call when asked to"""
+
+    def __init__(self, vectors: dict[str, list[float]], failures: int = 0):
+        self.vectors = vectors
+        self.failures = failures
+        self.calls = 0
+
+    async def aget_query_embedding(self, query: str) -> list[float]:
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("embedding service unavailable")
+        return self.vectors[query]
+
+    def similarity(self, a: list[float], b: list[float]) -> float:
+        return sum(x * y for x, y in zip(a, b))
+
+
+VECTORS = {"user message": [1.0, 0.0], "close query": [0.9, 0.1], "other query": [0.0, 1.0]}
+
+
+def count(name: str) -> int:
+    return get_metrics().get(name, 0)
+
+
+async def result(value, delay: float = 0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_take_reuses_a_similar_query():
+    async def run():
+        prefetch = PrefetchCache("user message", StubEmbedModel(VECTORS))
+        prefetch.start("test_hit", result("nodes"))
+        assert await prefetch.take("test_hit", "close query", Deadline(1)) == "nodes"
+        await prefetch.close()
+
+    before = count("test_hit.prefetch_hits")
+    asyncio.run(run())
+    assert count("test_hit.prefetch_hits") == before + 1
+    assert "test_hit.prefetch_wasted" not in get_metrics()
+
+
+def test_take_misses_a_different_query_and_close_counts_it_wasted():
+    async def run():
+        prefetch = PrefetchCache("user message", StubEmbedModel(VECTORS))
+        prefetch.start("test_miss", result("nodes"))
+        assert await prefetch.take("test_miss", "other query", Deadline(1)) is None
+        await prefetch.close()
+
+    asyncio.run(run())
+    assert get_metrics()["test_miss.prefetch_misses"] == 1
+    assert get_metrics()["test_miss.prefetch_wasted"] == 1
+
+
+def test_take_reraises_a_prefetch_timeout_counted_once():
+    async def run():
+        prefetch = PrefetchCache("user message", StubEmbedModel(VECTORS))
+        prefetch.start("test_late", run_with_budget(asyncio.sleep(1), 0.01, scope="test_late"))
+        with pytest.raises(asyncio.TimeoutError):
+            await prefetch.take("test_late", "user message", Deadline(1))
+        await prefetch.close()
+
+    asyncio.run(run())
+    assert get_metrics()["test_late.timeouts"] == 1
+    assert "test_late.prefetch_wasted" not in get_metrics()
+
+
+def test_cancelled_take_leaves_the_prefetch_running():
+    async def run():
+        prefetch = PrefetchCache("user message", StubEmbedModel(VECTORS))
+        prefetch.start("test_shield", run_with_budget(result("nodes", delay=0.05), 1, scope="test_shield"))
+        take = asyncio.ensure_future(prefetch.take("test_shield", "user message", Deadline(1)))
+        await asyncio.sleep(0.01)
+        take.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await take
+        assert "test_shield.cancellations" not in get_metrics()
+        # Still there for the next call with a similar query
+        assert await prefetch.take("test_shield", "user message", Deadline(1)) == "nodes"
+        await prefetch.close()
+
+    asyncio.run(run())
+
+
+def test_close_waits_for_cancelled_prefetches():
+    async def run():
+        prefetch = PrefetchCache("user message", StubEmbedModel(VECTORS))
+        prefetch.start("test_close", run_with_budget(asyncio.sleep(1), 1, scope="test_close"))
+        await asyncio.sleep(0)
+        await prefetch.close()
+        # The cancellation is only counted once the task has handled it, so close() must have waited
+        assert get_metrics()["test_close.cancellations"] == 1
+
+    asyncio.run(run())
+    assert get_metrics()["test_close.prefetch_wasted"] == 1
+
+
+def test_failed_embedding_is_computed_again():
+    async def run():
+        embed_model = StubEmbedModel(VECTORS, failures=1)
+        prefetch = PrefetchCache("user message", embed_model)
+        with pytest.raises(RuntimeError):
+            await prefetch.embedding("close query")
+        assert await prefetch.embedding("close query") == VECTORS["close query"]
+        assert embed_model.calls == 2
+
+    asyncio.run(run())
+
+
+def test_failed_prefetch_skips_the_comparison():
+    async def failing():
+        raise RuntimeError("search failed")
+
+    async def run():
+        embed_model = StubEmbedModel(VECTORS)
+        prefetch = PrefetchCache("user message", embed_model)
+        prefetch.start("test_failed", failing())
+        await asyncio.sleep(0)
+        calls = embed_model.calls
+        assert await prefetch.take("test_failed", "other query", Deadline(1)) is None
+        assert embed_model.calls == calls
+        await prefetch.close()
+
+    asyncio.run(run())
+    assert "test_failed.prefetch_misses" not in get_metrics()
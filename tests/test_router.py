@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from agent.router import AGENT, FAST, QueryRouter, heuristic_route
+
+
+@pytest.mark.parametrize("message", ["hi", "Thanks so much!", "ok got it", "good morning", "bye"])
+def test_greetings_and_acknowledgements_take_the_fast_path(message):
+    assert heuristic_route(message, has_history=True)[0] == FAST
+    assert heuristic_route(message, has_history=False)[0] == FAST
+
+
+@pytest.mark.parametrize("message", ["yes please", "no", "yeah", "sure", "nope"])
+def test_yes_or_no_after_an_answer_goes_to_the_agent(message):
+    assert heuristic_route(message, has_history=True) == (AGENT, "reply to the assistant's offer or question")
+
+
+@pytest.mark.parametrize("message", ["hi, how do I get an EHCP?", "hello there, any tips for bedtime routines"])
+def test_greeting_prefixed_questions_go_to_the_agent(message):
+    assert heuristic_route(message, has_history=False)[0] == AGENT
+
+
+@pytest.mark.parametrize("message", ["meltdowns", "NHS", "speech therapy"])
+def test_care_keywords_alone_go_to_the_agent(message):
+    assert heuristic_route(message, has_history=False) == (AGENT, "care topic")
+
+
+def test_rewrite_needs_history_and_no_new_topic():
+    assert heuristic_route("can you make that shorter", has_history=True) == (FAST, "rewrite of previous answer")
+    assert heuristic_route("can you make that shorter", has_history=False) is None
+    assert heuristic_route("summarise the rules for blue badge parking", has_history=True) is None
+
+
+def test_question_marks_keep_acknowledgement_words_off_the_fast_path():
+    assert heuristic_route("ok?", has_history=True) is None
+
+
+def test_undecided_turns_default_to_the_agent_without_an_embedding_model():
+    decision = asyncio.run(QueryRouter().aroute("what should I pack for the holiday", has_history=False))
+    assert (decision.route, decision.reason) == (AGENT, "default")